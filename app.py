@@ -5,90 +5,99 @@ Flask Application for Cold Email Generator
 Web interface for generating personalized cold emails from LinkedIn profiles and companies.
 Supports both individual profiles (/in/username) and company pages (/company/name).
 """
+import atexit
+import logging
 import os
+import queue
 import sys
-import json
 import shutil
-import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 
-from flask import Flask, render_template, request, jsonify
+import orjson
+from flask import Flask, render_template, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
 
 # Import our modules
-from fetch_user_profile import (
-    fetch_linkedin_profile, 
-    validate_linkedin_profile_url, 
-    validate_profile_data
-)
-from fetch_company_profile import (
-    fetch_linkedin_company,
-    validate_linkedin_company_url,
-    validate_company_data
-)
+from fetch_user_profile import fetch_linkedin_profile, validate_profile_data
+from fetch_company_profile import fetch_linkedin_company, validate_company_data
 from generate_email import run_email_generation
+from linkedin_utils import detect_url_type
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serve jsonify() and request.get_json() through orjson."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Request threads only enqueue log records; a background listener thread
+# does the blocking write to stderr.
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+_log_listener = QueueListener(_log_queue, _log_handler)
+# Attached directly rather than via basicConfig, which would give the
+# QueueHandler its own formatter and prefix every line twice
+logging.getLogger().addHandler(QueueHandler(_log_queue))
+# INFO only for this app's modules; third-party loggers (httpx, openai) stay
+# at the root's WARNING rather than logging every request URL
+for _name in (__name__, "fetch_user_profile", "fetch_company_profile", "linkedin_utils", "generate_email"):
+    logging.getLogger(_name).setLevel(logging.INFO)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+log = logging.getLogger(__name__)
 
 # Configuration
 WORK_DIR = os.path.join(os.path.dirname(__file__), "AllFiles")
 os.makedirs(WORK_DIR, exist_ok=True)
+RESULT_FILENAME = "email_result.json"
+RESULT_PATH = os.path.join(WORK_DIR, RESULT_FILENAME)
 
+# Batch generation: at most this many URLs per request, this many in flight
+MAX_BATCH_SIZE = 20
+BATCH_CONCURRENCY = 8
 
-def sanitize_filename(name):
-    """Convert name to a safe filename."""
-    if not name:
-        return "Unknown"
-    name = re.sub(r'[<>:"/\\|?*]', '', name)
-    name = name.replace(' ', '_')
-    name = name.strip('. ')
-    return name if name else "Unknown"
+# Shared by all batch requests so concurrent batches can't multiply the
+# number of simultaneous Apify runs
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="generate")
 
 
 def clear_work_directory():
     """Clear the working directory for fresh analysis."""
-    if os.path.exists(WORK_DIR):
-        for filename in os.listdir(WORK_DIR):
-            file_path = os.path.join(WORK_DIR, filename)
-            try:
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path)
-            except Exception as e:
-                print("Error deleting {}: {}".format(file_path, e))
-
-
-def detect_url_type(url):
-    """
-    Detect if URL is a user profile or company page.
-    
-    Returns:
-        'user', 'company', or None if invalid
-    """
-    if not url:
-        return None
-    
-    url = url.strip()
-    
-    # Check for user profile pattern
-    user_pattern = r'^https?://(www\.)?linkedin\.com/in/[\w\-]+/?$'
-    if re.match(user_pattern, url):
-        return 'user'
-    
-    # Check for company pattern
-    company_pattern = r'^https?://(www\.)?linkedin\.com/company/[\w\-]+/?$'
-    if re.match(company_pattern, url):
-        return 'company'
+    try:
+        entries = os.scandir(WORK_DIR)
+    except FileNotFoundError:
+        return
     
-    return None
+    # DirEntry caches the file type from the directory listing, so no extra stat() per entry
+    with entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except OSError as e:
+                log.warning("Error deleting %s: %s", entry.path, e)
 
 
 # Clear on startup (but not on Flask reloader restarts)
 is_reloader_restart = os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
 if not is_reloader_restart:
-    print("[INIT] Initializing Cold Email Generator...")
+    log.info("Initializing Cold Email Generator...")
     clear_work_directory()
-    print("[INIT] Ready for email generation")
+    log.info("Ready for email generation")
 
 
 @app.route('/')
@@ -125,79 +134,63 @@ def validate_url():
         })
 
 
-@app.route('/api/generate', methods=['POST'])
-def generate_email():
-    """
-    Full email generation pipeline:
-    1. Detect URL type (user/company)
-    2. Fetch LinkedIn data via Apify
-    3. Generate cold email with GPT
-    """
-    data = request.get_json()
-    url = data.get('url', '').strip()
-    product_description = data.get('product_description', '').strip()
-    
-    # Validate URL
-    url_type = detect_url_type(url)
-    if not url_type:
-        return jsonify({
-            'success': False,
-            'error': 'Invalid LinkedIn URL',
-            'step': 'validation'
-        }), 400
-    
-    # Validate product description
+def _validate_product_description(product_description):
+    """Return an error message if the product description is unusable."""
     if not product_description:
-        return jsonify({
-            'success': False,
-            'error': 'Product description is required',
-            'step': 'validation'
-        }), 400
+        return 'Product description is required'
     
     if len(product_description) > 200:
-        return jsonify({
-            'success': False,
-            'error': 'Product description must be 200 characters or less',
-            'step': 'validation'
-        }), 400
+        return 'Product description must be 200 characters or less'
     
-    try:
-        # Clear previous files
-        clear_work_directory()
+    return None
+
+
+def _generate_for_url(url, url_type, product_description, work_dir, force_refresh=False):
+    """
+    Fetch LinkedIn data for one URL and generate its cold email.
+    
+    Args:
+        url: Validated LinkedIn URL
+        url_type: 'user' or 'company'
+        product_description: One-liner product description
+        work_dir: Directory for this job's profile and result files
+        force_refresh: Bypass the profile cache
         
+    Returns:
+        Tuple of (response payload: dict, HTTP status: int)
+    """
+    try:
         # Step 1: Fetch profile/company from LinkedIn via Apify
-        print("\n[STEP 1] Fetching {} data from LinkedIn...".format(url_type))
+        log.info("[STEP 1] Fetching %s data from LinkedIn...", url_type)
         
         if url_type == 'user':
             success, profile_path, profile_data = fetch_linkedin_profile(
                 url,
-                output_path=WORK_DIR,
-                filename="profile_data.json"
+                output_path=work_dir,
+                filename="profile_data.json",
+                force_refresh=force_refresh
             )
             
             if not success:
-                return jsonify({
+                return ({
                     'success': False,
                     'error': 'Failed to fetch LinkedIn profile. Please check the URL and try again.',
                     'step': 'fetch'
-                }), 500
+                }, 500)
             
             # Validate profile data
-            is_valid, validation_error = validate_profile_data(profile_data)
+            is_valid, validation_error, profile_data = validate_profile_data(profile_data)
             
             if not is_valid:
-                print("[ERROR] Profile data validation failed: {}".format(validation_error))
-                return jsonify({
+                log.error("Profile data validation failed: %s", validation_error)
+                return ({
                     'success': False,
                     'error': validation_error,
                     'step': 'validation',
                     'details': 'Profile data could not be retrieved properly. Please ensure the profile is public.'
-                }), 400
+                }, 400)
             
             # Extract basic info for response
-            if isinstance(profile_data, list):
-                profile_data = profile_data[0]
-            
             if "basic_info" in profile_data:
                 basic_info = profile_data.get("basic_info", {})
                 full_name = basic_info.get("fullname", "Unknown")
@@ -209,43 +202,41 @@ def generate_email():
         else:  # company
             success, profile_path, profile_data = fetch_linkedin_company(
                 url,
-                output_path=WORK_DIR,
-                filename="company_data.json"
+                output_path=work_dir,
+                filename="company_data.json",
+                force_refresh=force_refresh
             )
             
             if not success:
-                return jsonify({
+                return ({
                     'success': False,
                     'error': 'Failed to fetch company data. Please check the URL and try again.',
                     'step': 'fetch'
-                }), 500
+                }, 500)
             
             # Validate company data
-            is_valid, validation_error = validate_company_data(profile_data)
+            is_valid, validation_error, profile_data = validate_company_data(profile_data)
             
             if not is_valid:
-                print("[ERROR] Company data validation failed: {}".format(validation_error))
-                return jsonify({
+                log.error("Company data validation failed: %s", validation_error)
+                return ({
                     'success': False,
                     'error': validation_error,
                     'step': 'validation',
                     'details': 'Company data could not be retrieved properly.'
-                }), 400
+                }, 400)
             
             # Extract basic info for response
-            if isinstance(profile_data, list):
-                profile_data = profile_data[0]
-            
             basic_info = profile_data.get("basic_info", {})
             full_name = basic_info.get("name", "Unknown Company")
             industries = basic_info.get("industries", [])
             headline = ", ".join(industries) if industries else basic_info.get("description", "")[:100]
         
-        print("   Fetched data for: {}".format(full_name))
+        log.info("Fetched data for: %s", full_name)
         
         # Step 2: Generate cold email
-        print("\n[STEP 2] Generating cold email...")
-        output_path = os.path.join(WORK_DIR, "email_result.json")
+        log.info("[STEP 2] Generating cold email...")
+        output_path = os.path.join(work_dir, RESULT_FILENAME)
         
         email_result = run_email_generation(
             profile_path, 
@@ -255,29 +246,29 @@ def generate_email():
         )
         
         if not email_result:
-            return jsonify({
+            return ({
                 'success': False,
                 'error': 'Email generation failed. Please try again.',
                 'step': 'generation'
-            }), 500
+            }, 500)
         
         # Check for parse errors
         if "_parse_error" in email_result:
-            print("   [WARN] Generation had parse issues but continuing...")
+            log.warning("Generation had parse issues but continuing...")
         
         # Extract email content
         email_content = email_result.get('email', '')
         
         if not email_content:
-            return jsonify({
+            return ({
                 'success': False,
                 'error': 'No email was generated. Please try again.',
                 'step': 'generation'
-            }), 500
+            }, 500)
         
-        print("   Email generated successfully!")
+        log.info("Email generated successfully!")
         
-        return jsonify({
+        return ({
             'success': True,
             'message': 'Email generated successfully!',
             'profile': {
@@ -286,33 +277,127 @@ def generate_email():
             },
             'email': email_content,
             'url_type': url_type
-        })
+        }, 200)
         
     except Exception as e:
-        print("[ERROR] Error during generation: {}".format(str(e)))
-        import traceback
-        traceback.print_exc()
-        return jsonify({
+        log.exception("Error during generation: %s", e)
+        return ({
             'success': False,
             'error': 'An error occurred: {}'.format(str(e)),
             'step': 'unknown'
-        }), 500
+        }, 500)
+
+
+@app.route('/api/generate', methods=['POST'])
+def generate_email():
+    """
+    Full email generation pipeline:
+    1. Detect URL type (user/company)
+    2. Fetch LinkedIn data via Apify (cached per URL unless force_refresh)
+    3. Generate cold email with GPT
+    """
+    data = request.get_json()
+    url = data.get('url', '').strip()
+    product_description = data.get('product_description', '').strip()
+    force_refresh = bool(data.get('force_refresh', False))
+    
+    # Validate URL
+    url_type = detect_url_type(url)
+    if not url_type:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid LinkedIn URL',
+            'step': 'validation'
+        }), 400
+    
+    # Validate product description
+    description_error = _validate_product_description(product_description)
+    if description_error:
+        return jsonify({
+            'success': False,
+            'error': description_error,
+            'step': 'validation'
+        }), 400
+    
+    # Each request gets its own directory, so concurrent requests never
+    # touch each other's files
+    with tempfile.TemporaryDirectory(dir=WORK_DIR, ignore_cleanup_errors=True) as request_dir:
+        payload, status = _generate_for_url(url, url_type, product_description, request_dir, force_refresh)
+        if status == 200:
+            # Publish as the latest result for /api/get-result (atomic rename)
+            os.replace(os.path.join(request_dir, RESULT_FILENAME), RESULT_PATH)
+    
+    return jsonify(payload), status
+
+
+@app.route('/api/generate-batch', methods=['POST'])
+def generate_email_batch():
+    """
+    Run the generation pipeline for several URLs concurrently.
+    
+    Each URL is fetched and emailed independently; the response is a JSON
+    array with one /api/generate-style result per URL, in request order.
+    """
+    data = request.get_json()
+    urls = [u.strip() for u in data.get('urls', []) if isinstance(u, str)]
+    product_description = data.get('product_description', '').strip()
+    force_refresh = bool(data.get('force_refresh', False))
+    
+    if not urls:
+        return jsonify({
+            'success': False,
+            'error': 'At least one LinkedIn URL is required',
+            'step': 'validation'
+        }), 400
+    
+    if len(urls) > MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'error': 'At most {} URLs can be processed per batch'.format(MAX_BATCH_SIZE),
+            'step': 'validation'
+        }), 400
+    
+    description_error = _validate_product_description(product_description)
+    if description_error:
+        return jsonify({
+            'success': False,
+            'error': description_error,
+            'step': 'validation'
+        }), 400
+    
+    def run_one(url):
+        url_type = detect_url_type(url)
+        if not url_type:
+            payload = {
+                'success': False,
+                'error': 'Invalid LinkedIn URL',
+                'step': 'validation'
+            }
+        else:
+            with tempfile.TemporaryDirectory(dir=WORK_DIR, ignore_cleanup_errors=True) as job_dir:
+                payload, _ = _generate_for_url(url, url_type, product_description, job_dir, force_refresh)
+        payload['url'] = url
+        return payload
+    
+    # Apify and OpenAI calls are I/O bound, so overlap them in threads
+    results = list(_batch_executor.map(run_one, urls))
+    
+    return jsonify(results)
 
 
 @app.route('/api/get-result')
 def get_result():
     """Get the full generation result JSON."""
-    result_path = os.path.join(WORK_DIR, "email_result.json")
-    
-    if not os.path.exists(result_path):
+    try:
+        # send_file streams the file as-is and sets ETag/Last-Modified, so a
+        # repeat request with If-None-Match gets an empty 304
+        response = send_file(RESULT_PATH, mimetype='application/json', max_age=0)
+        response.cache_control.private = True
+        return response
+    except FileNotFoundError:
         return jsonify({
             'error': 'No result found. Please generate an email first.'
         }), 404
-    
-    try:
-        with open(result_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return jsonify(data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -326,4 +411,6 @@ if __name__ == '__main__':
     print("=" * 50)
     print("")
     
-    app.run(debug=False, port=5000, use_reloader=False)
+    # Flask's dev server is threaded by default; requests are kept apart by
+    # their per-request work directories
+    app.run(debug=False, port=5000, use_reloader=False, threaded=True)
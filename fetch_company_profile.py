@@ -4,157 +4,136 @@ Fetch LinkedIn company profile using Apify actor `ipHw77V2NMJPy8sbS`.
 
 Behavior:
 - Reads API token from environment variable `APIFY_TOKEN`.
-- Calls the actor with a LinkedIn company identifier.
-- Saves the result as JSON file.
+- Calls the actor with a LinkedIn company identifier in a single run-sync
+  request over a persistent connection.
+- Saves the result as JSON file: a one-item list, as in Apify's dataset
+  format, whether fetched fresh or served from the cache.
 """
+import logging
 import os
 import sys
-import json
 import re
-from apify_client import ApifyClient
+import shutil
 
+import orjson
 
-def read_token():
-    """Read Apify API token from environment variable."""
-    token = os.getenv("APIFY_TOKEN")
-    if token:
-        return token.strip()
-    
-    # Fallback: Try reading from .env file
-    env_path = os.path.join(os.path.dirname(__file__), ".env")
-    if os.path.exists(env_path):
-        with open(env_path, "r") as f:
-            for line in f:
-                if line.startswith("APIFY_TOKEN="):
-                    return line.split("=", 1)[1].strip()
-    
-    return None
+from linkedin_utils import (
+    cache_get,
+    cache_set,
+    count_populated_fields,
+    new_download_path,
+    read_token,
+    run_actor_sync,
+    url_key,
+    validate_linkedin_company_url,
+)
 
 
-def sanitize_filename(name):
-    """Convert name to a safe filename."""
-    name = re.sub(r'[<>:"/\\|?*]', '', name)
-    name = name.replace(' ', '_')
-    name = name.strip('. ')
-    return name if name else "Unknown_Company"
+log = logging.getLogger(__name__)
 
-
-def validate_linkedin_company_url(url):
-    """
-    Validate if the URL is a valid LinkedIn company URL.
-    
-    Args:
-        url: String URL to validate
-        
-    Returns:
-        Boolean indicating if URL is valid
-    """
-    if not url:
-        return False
-    
-    # Pattern for LinkedIn company URLs
-    # Matches: https://www.linkedin.com/company/name/ or https://linkedin.com/company/name
-    pattern = r'^https?://(www\.)?linkedin\.com/company/[\w\-]+/?$'
-    return bool(re.match(pattern, url.strip()))
+_COMPANY_ID_RE = re.compile(r'/company/([^/]+)')
 
 
 def extract_company_identifier(linkedin_url):
     """Extract company identifier from LinkedIn company URL."""
-    match = re.search(r'/company/([^/]+)', linkedin_url)
+    match = _COMPANY_ID_RE.search(linkedin_url)
     if match:
         return match.group(1)
     return "unknown"
 
 
-def fetch_linkedin_company(linkedin_url, output_path=None, filename=None):
+def fetch_linkedin_company(linkedin_url, output_path=None, filename=None, force_refresh=False):
     """
     Fetch a LinkedIn company profile and save it as JSON.
     
     Args:
         linkedin_url: The LinkedIn company URL (e.g., https://www.linkedin.com/company/google/)
         output_path: Directory path to save the file (default: current directory)
-        filename: Custom filename (default: auto-generated from company name)
+        filename: Custom filename (default: derived from a hash of the URL)
+        force_refresh: Skip the local cache and always call Apify
         
     Returns:
         Tuple of (success: bool, filepath: str or None, company_data: dict or None)
     """
     # Validate URL first
     if not validate_linkedin_company_url(linkedin_url):
-        print("[ERROR] Invalid LinkedIn company URL: {}".format(linkedin_url))
-        print("   Expected format: https://www.linkedin.com/company/company-name/")
+        log.error("Invalid LinkedIn company URL: %s (expected format: https://www.linkedin.com/company/company-name/)", linkedin_url)
         return (False, None, None)
     
-    token = read_token()
-    if not token:
-        print("[ERROR] Apify API token not found. Set APIFY_TOKEN environment variable.")
-        return (False, None, None)
+    # Repeat fetches of the same URL are served from the local cache
+    company_data = None if force_refresh else cache_get(linkedin_url)
+    if company_data is not None:
+        log.info("Using cached company profile for: %s", linkedin_url)
+    else:
+        token = read_token()
+        if not token:
+            log.error("Apify API token not found. Set APIFY_TOKEN environment variable.")
+            return (False, None, None)
 
+    download_path = None
     try:
-        client = ApifyClient(token)
+        if output_path:
+            os.makedirs(output_path, exist_ok=True)
         
         # Extract company identifier from URL
         company_identifier = extract_company_identifier(linkedin_url)
         
-        run_input = {
-            "identifier": [company_identifier]
-        }
-
-        print("[INFO] Fetching company profile for: {}".format(linkedin_url))
-        print("[INFO] Company identifier: {}".format(company_identifier))
-        
-        # Use the company scraper actor
-        run = client.actor("ipHw77V2NMJPy8sbS").call(run_input=run_input)
-
-        dataset_id = run.get("defaultDatasetId")
-        if not dataset_id:
-            print("[ERROR] No dataset produced by the run.")
-            return (False, None, None)
-
-        # Fetch items from dataset
-        items = list(client.dataset(dataset_id).iterate_items())
-        
-        if not items:
-            print("[ERROR] No data returned from the actor.")
-            return (False, None, None)
-        
-        # Get the first (and should be only) item
-        company_data = items[0]
+        if company_data is None:
+            run_input = {
+                "identifier": [company_identifier]
+            }
+
+            log.info("Fetching company profile for: %s", linkedin_url)
+            log.info("Company identifier: %s", company_identifier)
+            
+            # Use the company scraper actor
+            # Stream the raw JSON to disk; it is moved into place once complete
+            download_path = new_download_path()
+            items = run_actor_sync("ipHw77V2NMJPy8sbS", run_input, token, limit=1, dest_path=download_path)
+            
+            if not items:
+                log.error("No data returned from the actor.")
+                os.remove(download_path)
+                return (False, None, None)
+            
+            # Only the first item is requested (limit=1)
+            company_data = items[0]
+            
+            # Don't cache error responses (e.g. Apify plan limits)
+            if "error" not in company_data:
+                cache_set(linkedin_url, company_data)
         
-        # Determine filename
-        if filename:
-            final_filename = filename
-        else:
-            # Try to get name from company data
-            company_name = None
-            if "basic_info" in company_data:
-                company_name = company_data.get("basic_info", {}).get("name")
-            if not company_name:
-                company_name = company_identifier
-            safe_name = sanitize_filename(company_name)
-            final_filename = "{}_company.json".format(safe_name)
+        # Determine filename (default: derived from the URL, so it never collides)
+        final_filename = filename or "{}_company.json".format(url_key(linkedin_url))
         
         # Determine full path
         if output_path:
-            os.makedirs(output_path, exist_ok=True)
             full_path = os.path.join(output_path, final_filename)
         else:
             full_path = final_filename
         
-        # Save to JSON file
-        with open(full_path, 'w', encoding='utf-8') as f:
-            json.dump(company_data, f, indent=2, ensure_ascii=False)
+        # Save to JSON file, always as a one-item list (Apify's dataset format):
+        # fresh downloads are already on disk in that shape, cache hits are wrapped
+        if download_path:
+            shutil.move(download_path, full_path)
+            download_path = None
+        else:
+            with open(full_path, 'wb') as f:
+                f.write(orjson.dumps([company_data], option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
         
-        print("[OK] Company profile saved to: {}".format(full_path))
+        log.info("Company profile saved to: %s", full_path)
         return (True, full_path, company_data)
         
     except Exception as e:
-        print("[ERROR] Failed to fetch company profile: {}".format(str(e)))
+        log.error("Failed to fetch company profile: %s", e)
+        if download_path and os.path.exists(download_path):
+            os.remove(download_path)
         # Try to save error response if available
         if output_path and filename:
             try:
                 error_path = os.path.join(output_path, filename)
-                with open(error_path, 'w', encoding='utf-8') as f:
-                    json.dump({"error": str(e)}, f, indent=2)
+                with open(error_path, 'wb') as f:
+                    f.write(orjson.dumps({"error": str(e)}, option=orjson.OPT_INDENT_2))
             except:
                 pass
         return (False, None, None)
@@ -168,23 +147,24 @@ def validate_company_data(company_data):
         company_data: Dictionary or list containing company data
         
     Returns:
-        Tuple of (is_valid: bool, error_message: str or None)
+        Tuple of (is_valid: bool, error_message: str or None, data: dict or None),
+        where data is the unwrapped record when valid
     """
     if not company_data:
-        return (False, "No company data received")
+        return (False, "No company data received", None)
     
     # Handle array format
     if isinstance(company_data, list):
         if len(company_data) == 0:
-            return (False, "No company data in array")
+            return (False, "No company data in array", None)
         company_data = company_data[0]
     
     # Check for error field in response (Apify free plan limitation)
     if "error" in company_data:
         error_msg = company_data.get("error", "Unknown error")
         if "free Apify plan" in error_msg:
-            return (False, "Unable to fetch company. This feature requires a paid Apify subscription.")
-        return (False, error_msg)
+            return (False, "Unable to fetch company. This feature requires a paid Apify subscription.", None)
+        return (False, error_msg, None)
     
     # Check for essential fields
     company_name = None
@@ -197,17 +177,18 @@ def validate_company_data(company_data):
         description = basic_info.get("description")
     
     if not company_name:
-        return (False, "Company data is incomplete. Missing company name.")
+        return (False, "Company data is incomplete. Missing company name.", None)
     
     # Check if data appears to be empty or minimal
-    if len(str(company_data)) < 100:
-        return (False, "Company data appears incomplete.")
+    if count_populated_fields(company_data) < 3:
+        return (False, "Company data appears incomplete.", None)
     
-    return (True, None)
+    return (True, None, company_data)
 
 
 def main():
     """Example usage."""
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
     linkedin_url = "https://www.linkedin.com/company/google/"
     success, filepath, data = fetch_linkedin_company(linkedin_url)
     
@@ -4,149 +4,120 @@ Fetch LinkedIn individual profile using Apify actor `VhxlqQXRwhW8H5hNV`.
 
 Behavior:
 - Reads API token from environment variable `APIFY_TOKEN`.
-- Calls the actor with a LinkedIn profile URL (e.g., /in/username/).
-- Saves the result as JSON file.
+- Calls the actor with a LinkedIn profile URL (e.g., /in/username/) in a
+  single run-sync request over a persistent connection.
+- Saves the result as JSON file: a one-item list, as in Apify's dataset
+  format, whether fetched fresh or served from the cache.
 """
+import logging
 import os
 import sys
-import json
-import re
-from apify_client import ApifyClient
+import shutil
 
+import orjson
 
-def read_token():
-    """Read Apify API token from environment variable."""
-    token = os.getenv("APIFY_TOKEN")
-    if token:
-        return token.strip()
-    
-    # Fallback: Try reading from .env file
-    env_path = os.path.join(os.path.dirname(__file__), ".env")
-    if os.path.exists(env_path):
-        with open(env_path, "r") as f:
-            for line in f:
-                if line.startswith("APIFY_TOKEN="):
-                    return line.split("=", 1)[1].strip()
-    
-    return None
-
-
-def sanitize_filename(name):
-    """Convert name to a safe filename."""
-    name = re.sub(r'[<>:"/\\|?*]', '', name)
-    name = name.replace(' ', '_')
-    name = name.strip('. ')
-    return name if name else "Unknown_Profile"
-
-
-def validate_linkedin_profile_url(url):
-    """
-    Validate if the URL is a valid LinkedIn individual profile URL.
-    
-    Args:
-        url: String URL to validate
-        
-    Returns:
-        Boolean indicating if URL is valid
-    """
-    if not url:
-        return False
-    
-    # Pattern for LinkedIn individual profile URLs
-    # Matches: https://www.linkedin.com/in/username/ or https://linkedin.com/in/username
-    pattern = r'^https?://(www\.)?linkedin\.com/in/[\w\-]+/?$'
-    return bool(re.match(pattern, url.strip()))
+from linkedin_utils import (
+    cache_get,
+    cache_set,
+    count_populated_fields,
+    new_download_path,
+    read_token,
+    run_actor_sync,
+    url_key,
+    validate_linkedin_profile_url,
+)
 
 
-def extract_username_from_url(linkedin_url):
-    """Extract username from LinkedIn profile URL."""
-    match = re.search(r'/in/([^/]+)', linkedin_url)
-    if match:
-        return match.group(1)
-    return "unknown"
+log = logging.getLogger(__name__)
 
 
-def fetch_linkedin_profile(linkedin_url, output_path=None, filename=None):
+def fetch_linkedin_profile(linkedin_url, output_path=None, filename=None, force_refresh=False):
     """
     Fetch a LinkedIn individual profile and save it as JSON.
     
     Args:
         linkedin_url: The LinkedIn profile URL (e.g., https://www.linkedin.com/in/username/)
         output_path: Directory path to save the file (default: current directory)
-        filename: Custom filename (default: auto-generated from profile name)
+        filename: Custom filename (default: derived from a hash of the URL)
+        force_refresh: Skip the local cache and always call Apify
         
     Returns:
         Tuple of (success: bool, filepath: str or None, profile_data: dict or None)
     """
     # Validate URL first
     if not validate_linkedin_profile_url(linkedin_url):
-        print("[ERROR] Invalid LinkedIn profile URL: {}".format(linkedin_url))
-        print("   Expected format: https://www.linkedin.com/in/username/")
+        log.error("Invalid LinkedIn profile URL: %s (expected format: https://www.linkedin.com/in/username/)", linkedin_url)
         return (False, None, None)
     
-    token = read_token()
-    if not token:
-        print("[ERROR] Apify API token not found. Set APIFY_TOKEN environment variable.")
-        return (False, None, None)
-
-    try:
-        client = ApifyClient(token)
-        run_input = {
-            "username": linkedin_url,
-            "includeEmail": False
-        }
-
-        print("[INFO] Fetching profile for: {}".format(linkedin_url))
-        run = client.actor("VhxlqQXRwhW8H5hNV").call(run_input=run_input)
-
-        dataset_id = run.get("defaultDatasetId")
-        if not dataset_id:
-            print("[ERROR] No dataset produced by the run.")
+    # Repeat fetches of the same URL are served from the local cache
+    profile_data = None if force_refresh else cache_get(linkedin_url)
+    if profile_data is not None:
+        log.info("Using cached profile for: %s", linkedin_url)
+    else:
+        token = read_token()
+        if not token:
+            log.error("Apify API token not found. Set APIFY_TOKEN environment variable.")
             return (False, None, None)
 
-        # Fetch items from dataset
-        items = list(client.dataset(dataset_id).iterate_items())
-        
-        if not items:
-            print("[ERROR] No data returned from the actor.")
-            return (False, None, None)
+    download_path = None
+    try:
+        if output_path:
+            os.makedirs(output_path, exist_ok=True)
         
-        # Get the first (and should be only) item
-        profile_data = items[0]
+        if profile_data is None:
+            run_input = {
+                "username": linkedin_url,
+                "includeEmail": False
+            }
+
+            log.info("Fetching profile for: %s", linkedin_url)
+            # Stream the raw JSON to disk; it is moved into place once complete
+            download_path = new_download_path()
+            items = run_actor_sync("VhxlqQXRwhW8H5hNV", run_input, token, limit=1, dest_path=download_path)
+            
+            if not items:
+                log.error("No data returned from the actor.")
+                os.remove(download_path)
+                return (False, None, None)
+            
+            # Only the first item is requested (limit=1)
+            profile_data = items[0]
+            
+            # Don't cache error responses (e.g. Apify plan limits)
+            if "error" not in profile_data:
+                cache_set(linkedin_url, profile_data)
         
-        # Determine filename
-        if filename:
-            final_filename = filename
-        else:
-            # Try to get name from profile data
-            full_name = profile_data.get("fullName") or profile_data.get("firstName", "")
-            if not full_name:
-                full_name = extract_username_from_url(linkedin_url)
-            safe_name = sanitize_filename(full_name)
-            final_filename = "{}_profile.json".format(safe_name)
+        # Determine filename (default: derived from the URL, so it never collides)
+        final_filename = filename or "{}_profile.json".format(url_key(linkedin_url))
         
         # Determine full path
         if output_path:
-            os.makedirs(output_path, exist_ok=True)
             full_path = os.path.join(output_path, final_filename)
         else:
             full_path = final_filename
         
-        # Save to JSON file
-        with open(full_path, 'w', encoding='utf-8') as f:
-            json.dump(profile_data, f, indent=2, ensure_ascii=False)
+        # Save to JSON file, always as a one-item list (Apify's dataset format):
+        # fresh downloads are already on disk in that shape, cache hits are wrapped
+        if download_path:
+            shutil.move(download_path, full_path)
+            download_path = None
+        else:
+            with open(full_path, 'wb') as f:
+                f.write(orjson.dumps([profile_data], option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
         
-        print("[OK] Profile saved to: {}".format(full_path))
+        log.info("Profile saved to: %s", full_path)
         return (True, full_path, profile_data)
         
     except Exception as e:
-        print("[ERROR] Failed to fetch profile: {}".format(str(e)))
+        log.error("Failed to fetch profile: %s", e)
+        if download_path and os.path.exists(download_path):
+            os.remove(download_path)
         # Try to save error response if available
         if output_path and filename:
             try:
                 error_path = os.path.join(output_path, filename)
-                with open(error_path, 'w', encoding='utf-8') as f:
-                    json.dump({"error": str(e)}, f, indent=2)
+                with open(error_path, 'wb') as f:
+                    f.write(orjson.dumps({"error": str(e)}, option=orjson.OPT_INDENT_2))
             except:
                 pass
         return (False, None, None)
@@ -161,23 +132,24 @@ def validate_profile_data(profile_data):
         profile_data: Dictionary or list containing profile data
         
     Returns:
-        Tuple of (is_valid: bool, error_message: str or None)
+        Tuple of (is_valid: bool, error_message: str or None, data: dict or None),
+        where data is the unwrapped record when valid
     """
     if not profile_data:
-        return (False, "No profile data received")
+        return (False, "No profile data received", None)
     
     # Handle array format (new dataset structure)
     if isinstance(profile_data, list):
         if len(profile_data) == 0:
-            return (False, "No profile data in array")
+            return (False, "No profile data in array", None)
         profile_data = profile_data[0]
     
     # Check for error field in response (Apify free plan limitation)
     if "error" in profile_data:
         error_msg = profile_data.get("error", "Unknown error")
         if "free Apify plan" in error_msg:
-            return (False, "Unable to fetch profile. This feature requires a paid Apify subscription. Please upgrade your Apify plan or use the Apify UI directly.")
-        return (False, error_msg)
+            return (False, "Unable to fetch profile. This feature requires a paid Apify subscription. Please upgrade your Apify plan or use the Apify UI directly.", None)
+        return (False, error_msg, None)
     
     # Check for essential fields - handle both flat and nested structures
     fullname = None
@@ -194,20 +166,21 @@ def validate_profile_data(profile_data):
         headline = profile_data.get("headline")
     
     if not fullname:
-        return (False, "Profile data is incomplete. Missing name information. The profile may be private or restricted.")
+        return (False, "Profile data is incomplete. Missing name information. The profile may be private or restricted.", None)
     
     if not headline:
-        return (False, "Profile data is incomplete. Missing headline information. The profile may be private or restricted.")
+        return (False, "Profile data is incomplete. Missing headline information. The profile may be private or restricted.", None)
     
     # Check if profile appears to be empty or minimal
-    if len(str(profile_data)) < 100:  # Very small JSON suggests incomplete data
-        return (False, "Profile data appears incomplete. The profile may be private or have limited information.")
+    if count_populated_fields(profile_data) < 4:  # Very few fields suggests incomplete data
+        return (False, "Profile data appears incomplete. The profile may be private or have limited information.", None)
     
-    return (True, None)
+    return (True, None, profile_data)
 
 
 def main():
     """Example usage."""
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
     linkedin_url = "https://www.linkedin.com/in/sree-swetha-kappagantula-b25355aa/"
     success, filepath, data = fetch_linkedin_profile(linkedin_url)
     
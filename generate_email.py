@@ -4,171 +4,458 @@ Cold Email Generator using OpenAI GPT
 
 Generates personalized cold emails based on LinkedIn profile/company data.
 Uses prompt1.md for individual profiles and prompt2.md for companies.
+With --batch, generates emails for a directory of profiles concurrently.
 """
+import asyncio
+import functools
+import hashlib
 import os
 import json
+import logging
 import sys
+import threading
 import time
 import re
+from pathlib import Path
 from typing import Dict, Any, Optional
 
-from openai import OpenAI
+import httpx
+import orjson
+from openai import AsyncOpenAI, OpenAI
 from openai._exceptions import RateLimitError, APIStatusError
 
 
-def read_api_key():
-    """Read OpenAI API key from environment variable."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if api_key:
-        return api_key.strip()
-    
-    # Fallback: Try reading from .env file
-    env_path = os.path.join(os.path.dirname(__file__), ".env")
-    if os.path.exists(env_path):
-        with open(env_path, "r") as f:
-            for line in f:
-                if line.startswith("OPENAI_API_KEY="):
-                    return line.split("=", 1)[1].strip()
+log = logging.getLogger(__name__)
+
+# Configuration
+MODEL = "o4-mini"
+# Low effort keeps hidden reasoning tokens (billed and generated before any
+# output) down. The output budget counts those reasoning tokens too, so it
+# stays well above the few hundred tokens of the email itself.
+REASONING_EFFORT = "low"
+REASONING_EFFORTS = ("low", "medium", "high")
+MAX_OUTPUT_TOKENS = 4000
+
+# Client-side request budget; set OPENAI_REQUESTS_PER_MINUTE to your account's RPM limit
+REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+
+# Fields sent to the model per profile type, with an optional cap on list length.
+# Everything else in the scraped payload (activity, media, recommendations...)
+# only adds input tokens.
+_PROFILE_FIELDS = {
+    "user": {"basic_info": None, "about": None, "experience": 3, "education": 3, "skills": 20},
+    "company": {"basic_info": None, "about": None, "specialties": None, "locations": 3},
+}
+
+# Matches JSON in markdown code blocks
+_CODE_BLOCK_RE = re.compile(r'```(?:json)?\s*([\s\S]*?)```')
+_JSON_DECODER = json.JSONDecoder()
+
+# One client per API key, reused across calls so the TLS connection to
+# api.openai.com stays open between generations
+_CLIENT_CACHE: Dict[str, OpenAI] = {}
+
+
+def _load_env_file():
+    """Fill OPENAI_API_KEY from the .env file next to this module, unless already set."""
+    if os.environ.get("OPENAI_API_KEY"):
+        return
     
-    return None
+    env_path = Path(__file__).with_name(".env")
+    try:
+        lines = env_path.read_text().splitlines()
+    except OSError:
+        return
+    
+    for line in lines:
+        if line.startswith("OPENAI_API_KEY="):
+            os.environ["OPENAI_API_KEY"] = line[len("OPENAI_API_KEY="):].strip()
+            return
 
 
-def read_prompt_template(prompt_file):
-    """Read an OpenAI prompt template from root directory."""
+# Read once at import; read_api_key() is then a plain environment lookup
+_load_env_file()
+
+
+def read_api_key():
+    """Read OpenAI API key from environment variable (or the .env file loaded at import)."""
+    api_key = os.environ.get("OPENAI_API_KEY")
+    return api_key.strip() if api_key else None
+
+
+def get_client(api_key):
+    """Return a cached OpenAI client (with a keep-alive connection pool) for api_key."""
+    client = _CLIENT_CACHE.get(api_key)
+    if client is None:
+        # HTTP/2 multiplexes concurrent requests over one TLS connection
+        http_client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=httpx.Timeout(300.0, connect=10.0),
+        )
+        client = _CLIENT_CACHE.setdefault(api_key, OpenAI(api_key=api_key, http_client=http_client))
+    return client
+
+
+@functools.lru_cache(maxsize=4)
+def _read_prompt_file(prompt_file):
+    """Read a prompt file; lru_cache doesn't cache exceptions, so failed reads are retried."""
     prompt_path = os.path.join(os.path.dirname(__file__), prompt_file)
+    with open(prompt_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def read_prompt_template(prompt_file):
+    """Read an OpenAI prompt template from root directory (cached after the first successful read)."""
     try:
-        with open(prompt_path, "r", encoding="utf-8") as f:
-            return f.read()
+        return _read_prompt_file(prompt_file)
     except Exception as e:
-        print("[ERROR] Error reading prompt template {}: {}".format(prompt_file, e))
+        log.error("Error reading prompt template %s: %s", prompt_file, e)
         return None
 
 
+class RateLimiter:
+    """
+    Token bucket allowing `rate` requests per `period` seconds.
+    
+    Callers reserve a slot before sending a request and sleep until it is
+    due, so bursts are spread out instead of bouncing off the API's 429s.
+    Safe to share between threads and asyncio tasks.
+    """
+    
+    def __init__(self, rate, period=60.0):
+        self.rate = rate
+        self.period = period
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _reserve(self):
+        """Take one token and return how many seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            refill = (now - self._updated) * self.rate / self.period
+            self._tokens = min(float(self.rate), self._tokens + refill)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * self.period / self.rate
+    
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+    
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_request_limiter = RateLimiter(REQUESTS_PER_MINUTE)
+
+
+def _retry_delay(error, attempt, base):
+    """Seconds to wait before retrying: the server's Retry-After hint if present, else base**attempt."""
+    response = getattr(error, "response", None)
+    headers = response.headers if response is not None else {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return base ** attempt
+
+
 def with_backoff(fn, max_retries=6, base=2.0):
-    """Retry function with exponential backoff for rate limits."""
+    """Call fn under the request rate limiter, retrying rate limits and transient errors."""
     for i in range(max_retries):
+        _request_limiter.acquire()
         try:
             return fn()
         except RateLimitError as e:
-            sleep = base ** i
-            print("[WAIT] Rate limit, retry {}/{} in {:.1f}s".format(i+1, max_retries, sleep))
+            sleep = _retry_delay(e, i, base)
+            log.warning("Rate limit, retry %d/%d in %.1fs", i + 1, max_retries, sleep)
             time.sleep(sleep)
         except APIStatusError as e:
             status = getattr(e, "status_code", 0)
             if status in (429, 500, 502, 503, 504):
-                sleep = base ** i
-                print("[WAIT] API error {}, retry {}/{} in {:.1f}s".format(status, i+1, max_retries, sleep))
+                sleep = _retry_delay(e, i, base)
+                log.warning("API error %s, retry %d/%d in %.1fs", status, i + 1, max_retries, sleep)
                 time.sleep(sleep)
             else:
                 raise
     raise RuntimeError("[ERROR] Exceeded retry attempts")
 
 
+async def awith_backoff(fn, max_retries=6, base=2.0):
+    """Async variant of with_backoff; fn returns an awaitable."""
+    for i in range(max_retries):
+        await _request_limiter.acquire_async()
+        try:
+            return await fn()
+        except RateLimitError as e:
+            sleep = _retry_delay(e, i, base)
+            log.warning("Rate limit, retry %d/%d in %.1fs", i + 1, max_retries, sleep)
+            await asyncio.sleep(sleep)
+        except APIStatusError as e:
+            status = getattr(e, "status_code", 0)
+            if status in (429, 500, 502, 503, 504):
+                sleep = _retry_delay(e, i, base)
+                log.warning("API error %s, retry %d/%d in %.1fs", status, i + 1, max_retries, sleep)
+                await asyncio.sleep(sleep)
+            else:
+                raise
+    raise RuntimeError("[ERROR] Exceeded retry attempts")
+
+
 def extract_output_text(resp):
-    """Extract text from Responses API response object."""
-    try:
-        txt = getattr(resp, "output_text", None)
-        if txt:
-            return txt
-    except Exception:
-        pass
-    
-    # Fallback: flatten outputs
-    try:
-        chunks = []
-        for item in resp.output or []:
-            if getattr(item, "content", None):
-                for c in item.content:
-                    t = getattr(c, "text", None)
-                    if t:
-                        chunks.append(t)
-        if chunks:
-            return "\n".join(chunks)
-    except Exception:
-        pass
+    """
+    Extract text from Responses API response object.
     
-    # Last resort: raw JSON
-    try:
-        return resp.model_dump_json()
-    except Exception:
-        return str(resp)
+    Raises:
+        ValueError: If the response is incomplete (e.g. it ran out of
+            max_output_tokens) or carries no output text
+    """
+    # A truncated answer must not be published as if it were the email
+    if getattr(resp, "status", None) == "incomplete":
+        details = getattr(resp, "incomplete_details", None)
+        raise ValueError("Response incomplete (reason: {})".format(getattr(details, "reason", None)))
+    
+    # output_text is "" (never None) when the model produced no text
+    txt = getattr(resp, "output_text", None)
+    if txt:
+        return txt
+    
+    raise ValueError("Response has no output text (status: {}, incomplete_details: {})".format(
+        getattr(resp, "status", None), getattr(resp, "incomplete_details", None)))
 
 
 def extract_json_from_response(text):
     """Extract JSON from response text, handling markdown code blocks."""
-    # Pattern to match JSON in code blocks
-    code_block_pattern = r'```(?:json)?\s*([\s\S]*?)```'
-    matches = re.findall(code_block_pattern, text)
-    
-    for match in matches:
+    # A fenced block is the model's explicit answer, so it wins
+    for match in _CODE_BLOCK_RE.findall(text):
         try:
-            return json.loads(match.strip())
+            return orjson.loads(match.strip())
         except json.JSONDecodeError:
             continue
     
-    # Try to parse the whole text as JSON
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        pass
+    # Otherwise scan for objects: raw_decode parses just the object starting
+    # at each '{' and ignores whatever follows. Prose can contain stray
+    # objects (e.g. "{}"), so prefer one that carries an email.
+    first = None
+    i = text.find('{')
+    while i != -1:
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, i)
+        except json.JSONDecodeError:
+            i = text.find('{', i + 1)
+            continue
+        if "email" in obj:
+            return obj
+        if first is None:
+            first = obj
+        i = text.find('{', end)
     
-    # Try to find JSON object in text
-    try:
-        start = text.find('{')
-        end = text.rfind('}') + 1
-        if start != -1 and end > start:
-            return json.loads(text[start:end])
-    except json.JSONDecodeError:
-        pass
+    if first is not None:
+        return first
     
     return {"_parse_error": "Could not extract JSON", "_raw": text}
 
 
-def generate_cold_email(client, model, prompt_text, profile_data, product_description, max_output_tokens=4000):
+def _select_profile_fields(profile_data, profile_type):
+    """
+    Keep only the fields the prompt uses, capping long lists.
+    
+    Only applies to the nested (basic_info) schema; flat payloads are
+    returned unchanged since their field names are not known here.
+    """
+    if "basic_info" not in profile_data:
+        return profile_data
+    
+    selected = {}
+    for key, limit in _PROFILE_FIELDS.get(profile_type, _PROFILE_FIELDS["user"]).items():
+        value = profile_data.get(key)
+        if not value:
+            continue
+        selected[key] = value[:limit] if limit and isinstance(value, list) else value
+    return selected
+
+
+def build_email_input(prompt_text, profile_data, product_description):
+    """
+    Combine the prompt template, product pitch and LinkedIn data into one model input.
+    
+    The parts that repeat across a campaign (template + product pitch) form
+    a fixed prefix and the per-profile JSON goes last, so OpenAI's prompt
+    cache can reuse the prefix for every profile pitched the same product.
+    
+    Returns:
+        Tuple of (full_input: str, prompt_cache_key: str)
+    """
+    static_prefix = (
+        "{}\n\n"
+        "Product/Service being pitched:\n"
+        "{}\n\n"
+    ).format(prompt_text, product_description)
+    
+    profile_json = orjson.dumps(
+        profile_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+    ).decode()
+    
+    dynamic_tail = "LinkedIn Data JSON:\n" + profile_json
+    
+    # Stable across processes (unlike hash()), so requests sharing a prefix share a cache key
+    prompt_cache_key = hashlib.sha256(static_prefix.encode("utf-8")).hexdigest()[:32]
+    
+    return static_prefix + dynamic_tail, prompt_cache_key
+
+
+async def _agenerate(client, model, full_input, prompt_cache_key=None, max_output_tokens=MAX_OUTPUT_TOKENS,
+                     reasoning_effort=REASONING_EFFORT):
+    """Async counterpart of generate_cold_email for an already-built input."""
+    async def do_call():
+        return await client.responses.create(
+            model=model,
+            reasoning={"effort": reasoning_effort},
+            input=full_input,
+            max_output_tokens=max_output_tokens,
+            prompt_cache_key=prompt_cache_key,
+        )
+    
+    resp = await awith_backoff(do_call)
+    return extract_json_from_response(extract_output_text(resp))
+
+
+def load_profile(profile_json_path):
+    """
+    Load a profile/company JSON file, unwrapping the one-item list format.
+    
+    Returns:
+        The profile/company data as a dict
+    """
+    with open(profile_json_path, "rb") as f:
+        profile_data = orjson.loads(f.read())
+    
+    if isinstance(profile_data, list):
+        if len(profile_data) == 0:
+            raise ValueError("Empty profile data array")
+        profile_data = profile_data[0]
+    
+    # Checked once here so later lookups can assume a dict
+    if not isinstance(profile_data, dict):
+        raise ValueError("Profile data must be a JSON object")
+    
+    return profile_data
+
+
+def _summarize(profile_data, profile_type):
+    """
+    Return the display name and headline of a loaded profile.
+    
+    Args:
+        profile_data: Profile or company dict, as returned by load_profile
+        profile_type: "user" or "company"
+        
+    Returns:
+        Tuple of (name: str, headline: str); missing or null fields fall
+        back to placeholders, so display code never has to check
+    """
+    # Scraped payloads can carry explicit nulls, so `or` rather than get() defaults
+    basic_info = profile_data.get("basic_info")
+    if not isinstance(basic_info, dict):
+        basic_info = None
+    
+    if profile_type == "company":
+        basic_info = basic_info or {}
+        industries = basic_info.get("industries")
+        headline = ", ".join(str(i) for i in industries) if isinstance(industries, list) and industries else None
+        return (str(basic_info.get("name") or "Unknown Company"), headline or "N/A")
+    
+    if basic_info is not None:
+        return (str(basic_info.get("fullname") or "Unknown"), str(basic_info.get("headline") or "N/A"))
+    
+    return (str(profile_data.get("fullName") or "Unknown"), str(profile_data.get("headline") or "N/A"))
+
+
+def finalize_result(result):
+    """Fall back to the raw model text as the email when JSON parsing failed."""
+    if "_parse_error" in result:
+        log.warning("JSON parse warning: %s", result['_parse_error'])
+        # Try to extract email from raw text if available
+        raw = result.get("_raw", "")
+        if raw:
+            # Simple extraction of email text
+            result = {"email": raw}
+    return result
+
+
+def save_result(result, output_path):
+    """Write a generation result as pretty-printed JSON."""
+    path = Path(output_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # orjson emits UTF-8 bytes directly, so there is no text-mode encode layer
+    path.write_bytes(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+
+
+def generate_cold_email(client, model, prompt_text, profile_data, product_description, max_output_tokens=MAX_OUTPUT_TOKENS,
+                        on_delta=None, reasoning_effort=REASONING_EFFORT):
     """
     Call GPT to generate a cold email based on LinkedIn data.
     
+    The response is streamed; text arrives as it is generated instead of
+    after the whole completion.
+    
     Args:
         client: OpenAI client
         model: Model name to use
         prompt_text: The prompt template
         profile_data: LinkedIn profile or company data
         product_description: One-liner product description
-        max_output_tokens: Maximum tokens for output
+        max_output_tokens: Maximum tokens for output (reasoning included)
+        on_delta: Optional callback receiving each chunk of output text
+        reasoning_effort: Reasoning effort ("low", "medium" or "high")
         
     Returns:
         Dictionary with email content
     """
-    user_payload = (
-        "Product/Service being pitched:\n"
-        "{}\n\n"
-        "LinkedIn Data JSON:\n"
-        "{}"
-    ).format(product_description, json.dumps(profile_data, ensure_ascii=False, indent=2))
-    
-    # Combine instructions with user payload
-    full_input = prompt_text + "\n\n" + user_payload
+    full_input, prompt_cache_key = build_email_input(prompt_text, profile_data, product_description)
     
     def do_call():
-        return client.responses.create(
+        with client.responses.stream(
             model=model,
-            reasoning={"effort": "medium"},
+            reasoning={"effort": reasoning_effort},
             input=full_input,
             max_output_tokens=max_output_tokens,
-        )
-    
-    print("   Input size: {:,} chars".format(len(full_input)))
+            prompt_cache_key=prompt_cache_key,
+        ) as stream:
+            for event in stream:
+                if on_delta and event.type == "response.output_text.delta":
+                    on_delta(event.delta)
+            return stream.get_final_response()
+    
+    log.debug("Input size: %d chars", len(full_input))
     resp = with_backoff(do_call)
     txt = extract_output_text(resp)
     
     # Print usage stats
     if hasattr(resp, 'usage'):
-        print("   Tokens: input={:,}, output={:,}".format(resp.usage.input_tokens, resp.usage.output_tokens))
+        log.info("Tokens: input=%d, output=%d", resp.usage.input_tokens, resp.usage.output_tokens)
     
     return extract_json_from_response(txt)
 
 
-def run_email_generation(profile_json_path, product_description, profile_type="user", output_path=None):
+def _write_delta(text):
+    """Echo streamed model output to the console as it arrives."""
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def run_email_generation(profile_json_path, product_description, profile_type="user", output_path=None, stream_output=False,
+                         reasoning_effort=REASONING_EFFORT, max_output_tokens=MAX_OUTPUT_TOKENS, quiet=False):
     """
     Run the full email generation pipeline.
     
@@ -177,138 +464,232 @@ def run_email_generation(profile_json_path, product_description, profile_type="u
         product_description: One-liner product description
         profile_type: "user" or "company"
         output_path: Optional path to save the result
+        stream_output: Echo the model output to stdout while it is generated
+        reasoning_effort: Reasoning effort for the model ("low", "medium" or "high")
+        max_output_tokens: Maximum tokens for output (reasoning included)
+        quiet: Log progress at DEBUG instead of INFO (errors are always logged)
         
     Returns:
         The generation result as a dictionary, or None on failure
     """
-    print("=" * 70)
-    print("Cold Email Generator")
-    print("=" * 70)
-    
-    # Configuration
-    MODEL = "o4-mini"
-    MAX_OUTPUT_TOKENS = 4000
+    # Progress goes to DEBUG when quiet, so callers can silence it per call
+    level = logging.DEBUG if quiet else logging.INFO
     
     # Step 1: Read API key
-    print("\n[STEP 1] Setup")
-    print("-" * 70)
+    log.log(level, "[STEP 1] Setup")
     api_key = read_api_key()
     if not api_key:
-        print("[ERROR] OPENAI_API_KEY not found")
+        log.error("OPENAI_API_KEY not found")
         return None
-    print("[OK] API key loaded")
+    log.log(level, "API key loaded")
     
-    client = OpenAI(api_key=api_key)
+    client = get_client(api_key)
     
     # Step 2: Read appropriate prompt based on profile type
-    print("\n[STEP 2] Loading Prompt")
-    print("-" * 70)
+    log.log(level, "[STEP 2] Loading Prompt")
     
     prompt_file = "prompt1.md" if profile_type == "user" else "prompt2.md"
     prompt_text = read_prompt_template(prompt_file)
     
     if not prompt_text:
-        print("[ERROR] Failed to load {}".format(prompt_file))
+        log.error("Failed to load %s", prompt_file)
         return None
     
-    print("[OK] Loaded {} ({:,} chars)".format(prompt_file, len(prompt_text)))
-    print("   Profile type: {}".format(profile_type))
+    log.log(level, "Loaded %s (%d chars), profile type: %s", prompt_file, len(prompt_text), profile_type)
     
     # Step 3: Load profile data
-    print("\n[STEP 3] Loading Profile Data")
-    print("-" * 70)
+    log.log(level, "[STEP 3] Loading Profile Data")
     
     try:
-        with open(profile_json_path, "r", encoding="utf-8") as f:
-            profile_data = json.load(f)
-        print("[OK] Loaded profile from: {}".format(profile_json_path))
+        profile_data = load_profile(profile_json_path)
+        log.log(level, "Loaded profile from: %s", profile_json_path)
     except Exception as e:
-        print("[ERROR] Error loading profile: {}".format(e))
+        log.error("Error loading profile: %s", e)
         return None
     
-    # Handle array format (extract first element)
-    if isinstance(profile_data, list):
-        if len(profile_data) == 0:
-            print("[ERROR] Empty profile data array")
-            return None
-        profile_data = profile_data[0]
-    
-    # Display profile info
-    if profile_type == "company":
-        basic_info = profile_data.get("basic_info", {})
-        name = basic_info.get("name", "Unknown Company")
-        headline = ", ".join(basic_info.get("industries", [])) if basic_info.get("industries") else "N/A"
-    else:
-        if "basic_info" in profile_data:
-            basic_info = profile_data.get("basic_info", {})
-            name = basic_info.get("fullname", "Unknown")
-            headline = basic_info.get("headline", "N/A")
-        else:
-            name = profile_data.get("fullName", "Unknown")
-            headline = profile_data.get("headline", "N/A")
-    
-    print("   Name: {}".format(name))
-    if len(headline) > 50:
-        print("   Info: {}...".format(headline[:50]))
-    else:
-        print("   Info: {}".format(headline))
-    print("   Product: {}".format(product_description[:50] + "..." if len(product_description) > 50 else product_description))
-    
     # Step 4: Generate cold email
-    print("\n[STEP 4] Generating Cold Email")
-    print("-" * 70)
-    print("[INFO] Generating email with {}...".format(MODEL))
+    log.log(level, "[STEP 4] Generating email with %s (effort: %s)...", MODEL, reasoning_effort)
     
-    result = generate_cold_email(
-        client, MODEL, prompt_text, profile_data, product_description, MAX_OUTPUT_TOKENS
-    )
+    try:
+        result = generate_cold_email(
+            client, MODEL, prompt_text, _select_profile_fields(profile_data, profile_type),
+            product_description, max_output_tokens,
+            on_delta=_write_delta if stream_output else None,
+            reasoning_effort=reasoning_effort
+        )
+    except ValueError as e:
+        # Incomplete or empty model output; nothing usable to save
+        log.error("Email generation failed: %s", e)
+        return None
+    finally:
+        if stream_output:
+            _write_delta("\n")
+    
+    # Display profile info (after the request, so it stays off the critical path)
+    if log.isEnabledFor(level):
+        name, headline = _summarize(profile_data, profile_type)
+        log.log(level, "Name: %s", name)
+        log.log(level, "Info: %s", headline[:50] + "..." if len(headline) > 50 else headline)
+        log.log(level, "Product: %s", product_description[:50] + "..." if len(product_description) > 50 else product_description)
     
     # Check for parse errors
-    if "_parse_error" in result:
-        print("[WARN] JSON parse warning: {}".format(result['_parse_error']))
-        # Try to extract email from raw text if available
-        raw = result.get("_raw", "")
-        if raw:
-            # Simple extraction of email text
-            result = {"email": raw}
+    result = finalize_result(result)
     
     # Step 5: Save result if path provided
     if output_path:
-        print("\n[STEP 5] Saving Results")
-        print("-" * 70)
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
-        print("[OK] Result saved to: {}".format(output_path))
-    
-    # Summary
-    print("\n" + "=" * 70)
-    print("[DONE] EMAIL GENERATED!")
-    print("=" * 70)
+        save_result(result, output_path)
+        log.log(level, "[STEP 5] Result saved to: %s", output_path)
     
-    # Display generated email
-    if "email" in result:
-        print("\nGenerated Email:")
-        print("-" * 40)
-        print(result["email"])
-        print("-" * 40)
+    log.log(level, "Email generated")
     
     return result
 
 
+async def run_email_generation_batch(jobs, concurrency=8, reasoning_effort=REASONING_EFFORT,
+                                     max_output_tokens=MAX_OUTPUT_TOKENS, quiet=False):
+    """
+    Generate emails for many profiles concurrently.
+    
+    Args:
+        jobs: List of (profile_json_path, product_description, profile_type, output_path)
+            tuples, with the same meaning as run_email_generation's arguments
+        concurrency: Maximum number of OpenAI requests in flight
+        reasoning_effort: Reasoning effort for every request
+        max_output_tokens: Maximum tokens for each output (reasoning included)
+        quiet: Log per-job progress at DEBUG instead of INFO
+        
+    Returns:
+        List of generation results in job order (None for failed jobs)
+    """
+    api_key = read_api_key()
+    if not api_key:
+        log.error("OPENAI_API_KEY not found")
+        return [None] * len(jobs)
+    
+    level = logging.DEBUG if quiet else logging.INFO
+    sem = asyncio.Semaphore(concurrency)
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=httpx.Timeout(300.0, connect=10.0),
+    )
+    
+    async with AsyncOpenAI(api_key=api_key, http_client=http_client) as client:
+        async def run_job(job):
+            profile_json_path, product_description, profile_type, output_path = job
+            async with sem:
+                try:
+                    prompt_file = "prompt1.md" if profile_type == "user" else "prompt2.md"
+                    prompt_text = read_prompt_template(prompt_file)
+                    if not prompt_text:
+                        raise ValueError("Failed to load {}".format(prompt_file))
+                    
+                    profile_data = load_profile(profile_json_path)
+                    full_input, prompt_cache_key = build_email_input(
+                        prompt_text, _select_profile_fields(profile_data, profile_type), product_description
+                    )
+                    name, _ = _summarize(profile_data, profile_type)
+                    result = await _agenerate(
+                        client, MODEL, full_input, prompt_cache_key, max_output_tokens, reasoning_effort
+                    )
+                except Exception as e:
+                    log.error("%s: %s", profile_json_path, e)
+                    return None
+            
+            # Outside the semaphore, but a failed write still only fails this job
+            try:
+                result = finalize_result(result)
+                if output_path:
+                    save_result(result, output_path)
+            except Exception as e:
+                log.error("%s: %s", profile_json_path, e)
+                return None
+            
+            log.log(level, "Generated email for: %s (%s)", name, profile_json_path)
+            return result
+        
+        return await asyncio.gather(*(run_job(job) for job in jobs))
+
+
+def _batch_jobs(profiles_dir, product_description, profile_type, output_dir):
+    """Build batch jobs for every .json file in profiles_dir."""
+    jobs = []
+    for name in sorted(os.listdir(profiles_dir)):
+        if not name.endswith(".json"):
+            continue
+        output_path = None
+        if output_dir:
+            output_path = os.path.join(output_dir, "{}_email.json".format(name[:-len(".json")]))
+        jobs.append((os.path.join(profiles_dir, name), product_description, profile_type, output_path))
+    return jobs
+
+
+def _pop_option(args, name, default):
+    """Remove `name value` from args (in place) and return value, or default if absent."""
+    if name not in args:
+        return default
+    i = args.index(name)
+    if i + 1 >= len(args):
+        raise SystemExit("{} needs a value".format(name))
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
+
+
 def main():
     """Main function - can be called with command line args or imported."""
-    if len(sys.argv) > 2:
-        profile_path = sys.argv[1]
-        product_description = sys.argv[2]
-        profile_type = sys.argv[3] if len(sys.argv) > 3 else "user"
-        output_path = sys.argv[4] if len(sys.argv) > 4 else None
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    args = sys.argv[1:]
+    reasoning_effort = _pop_option(args, "--effort", REASONING_EFFORT)
+    if reasoning_effort not in REASONING_EFFORTS:
+        raise SystemExit("--effort must be one of: {}".format(", ".join(REASONING_EFFORTS)))
+    
+    max_output_tokens = _pop_option(args, "--max-tokens", MAX_OUTPUT_TOKENS)
+    try:
+        max_output_tokens = int(max_output_tokens)
+    except ValueError:
+        max_output_tokens = 0
+    if max_output_tokens <= 0:
+        raise SystemExit("--max-tokens must be a positive integer")
+    
+    if len(args) > 2 and args[0] == "--batch":
+        profiles_dir = args[1]
+        product_description = args[2]
+        profile_type = args[3] if len(args) > 3 else "user"
+        output_dir = args[4] if len(args) > 4 else None
+        
+        jobs = _batch_jobs(profiles_dir, product_description, profile_type, output_dir)
+        results = asyncio.run(run_email_generation_batch(
+            jobs, reasoning_effort=reasoning_effort, max_output_tokens=max_output_tokens
+        ))
+        log.info("Done: %d/%d emails generated", sum(1 for r in results if r), len(jobs))
+        return results
+    
+    if len(args) > 1:
+        profile_path = args[0]
+        product_description = args[1]
+        profile_type = args[2] if len(args) > 2 else "user"
+        output_path = args[3] if len(args) > 3 else None
     else:
         # Default test
         print("Usage: python generate_email.py <profile_json> <product_description> [user|company] [output_path]")
+        print("       python generate_email.py --batch <profiles_dir> <product_description> [user|company] [output_dir]")
+        print("Options: --effort low|medium|high (default: {}), --max-tokens N (default: {})".format(
+            REASONING_EFFORT, MAX_OUTPUT_TOKENS))
         return None
     
-    result = run_email_generation(profile_path, product_description, profile_type, output_path)
+    result = run_email_generation(
+        profile_path, product_description, profile_type, output_path, stream_output=True,
+        reasoning_effort=reasoning_effort, max_output_tokens=max_output_tokens
+    )
+    
+    # Display generated email
+    if result and "email" in result:
+        print("\nGenerated Email:")
+        print("-" * 40)
+        print(result["email"])
+        print("-" * 40)
+    
     return result
 
 
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the LinkedIn fetchers.
+
+Behavior:
+- Keeps one persistent HTTPS connection pool to the Apify API for the
+  lifetime of the process, so repeated fetches skip the TCP/TLS handshake.
+- Runs actors through Apify's `run-sync-get-dataset-items` endpoint, which
+  starts the run, waits for it and returns the dataset items in one request.
+- Caches fetched profiles on disk, keyed by normalized URL, so repeat
+  fetches of the same URL skip Apify entirely.
+- Holds helpers shared by the fetchers and the web app (token lookup, URL
+  detection and validation, URL-derived file keys), so each has a single
+  implementation.
+"""
+import functools
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+import orjson
+
+
+log = logging.getLogger(__name__)
+
+APIFY_API_URL = "https://api.apify.com/v2"
+
+# (prefix, url type) for every accepted scheme/host combination
+_URL_PREFIXES = tuple(
+    ("{}://{}linkedin.com/{}/".format(scheme, www, path), url_type)
+    for path, url_type in (("in", "user"), ("company", "company"))
+    for scheme in ("https", "http")
+    for www in ("www.", "")
+)
+
+# Lives outside the app's work directory, which is cleared on every request
+CACHE_DIR = os.path.join(os.path.dirname(__file__), ".linkedin_cache")
+CACHE_TTL = 7 * 24 * 3600
+
+# Apify keeps a run-sync request open for at most 300 seconds
+RUN_SYNC_TIMEOUT = 300
+
+_http_client = httpx.Client(
+    base_url=APIFY_API_URL,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=32, keepalive_expiry=120),
+    timeout=httpx.Timeout(RUN_SYNC_TIMEOUT + 30, connect=10.0),
+)
+
+
+def run_actor_sync(actor_id, run_input, token, limit=None, dest_path=None):
+    """
+    Run an Apify actor and return the items of its default dataset.
+
+    Args:
+        actor_id: Apify actor ID
+        run_input: Input dictionary for the actor
+        token: Apify API token
+        limit: Maximum number of items to download (default: all)
+        dest_path: If given, the raw dataset JSON (a list of items) is
+            streamed into this file as it arrives instead of being
+            re-encoded later
+
+    Returns:
+        List of dataset items (possibly empty)
+
+    Raises:
+        RuntimeError: If the run does not finish within RUN_SYNC_TIMEOUT
+        httpx.HTTPError: On any other request failure
+    """
+    # The token goes in a header, not the query string, so it never shows
+    # up in logged request URLs
+    params = {"limit": limit} if limit else {}
+
+    with _http_client.stream(
+        "POST",
+        "/acts/{}/run-sync-get-dataset-items".format(actor_id),
+        params=params,
+        content=orjson.dumps(run_input),
+        headers={"Content-Type": "application/json", "Authorization": "Bearer {}".format(token)},
+    ) as response:
+        # 408 means the run outlived the run-sync window. The run keeps going
+        # on Apify, so starting another one would only pay for it twice.
+        if response.status_code == 408:
+            raise RuntimeError("Actor {} did not finish within {}s".format(actor_id, RUN_SYNC_TIMEOUT))
+
+        response.raise_for_status()
+
+        if not dest_path:
+            return orjson.loads(response.read())
+
+        with open(dest_path, 'wb') as f:
+            for chunk in response.iter_bytes():
+                f.write(chunk)
+
+    with open(dest_path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+def detect_url_type(url):
+    """
+    Detect if URL is a user profile or company page.
+
+    Accepts http(s), with or without `www.`, an optional trailing slash and
+    a slug of word characters or dashes.
+
+    Returns:
+        'user', 'company', or None if invalid
+    """
+    if not url:
+        return None
+
+    url = url.strip().removesuffix('/')
+
+    for prefix, url_type in _URL_PREFIXES:
+        if url.startswith(prefix):
+            slug = url[len(prefix):]
+            # Same charset as [\w\-]+ without running the regex engine
+            rest = slug.replace('-', '').replace('_', '')
+            if slug and (not rest or rest.isalnum()):
+                return url_type
+            return None
+
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def read_token():
+    """Read Apify API token from environment variable (resolved once per process)."""
+    token = os.getenv("APIFY_TOKEN")
+    if token:
+        return token.strip()
+
+    # Fallback: Try reading from .env file
+    env_path = os.path.join(os.path.dirname(__file__), ".env")
+    try:
+        with open(env_path, "r") as f:
+            return next((line.split("=", 1)[1].strip() for line in f if line.startswith("APIFY_TOKEN=")), None)
+    except OSError:
+        return None
+
+
+def normalize_url(url):
+    """Normalize a LinkedIn URL for use as a cache key."""
+    return url.strip().lower().removesuffix('/')
+
+
+def url_key(url):
+    """
+    Return a short, filesystem-safe key for a LinkedIn URL.
+
+    Used for both cache entries and default output filenames, so the same
+    URL always maps to the same name and different URLs never collide.
+    """
+    return hashlib.blake2b(normalize_url(url).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _cache_path(url):
+    return os.path.join(CACHE_DIR, "{}.json".format(url_key(url)))
+
+
+def cache_get(url):
+    """
+    Return cached data for a LinkedIn URL.
+
+    Args:
+        url: LinkedIn profile or company URL
+
+    Returns:
+        The cached data, or None if missing or older than CACHE_TTL
+    """
+    path = _cache_path(url)
+    try:
+        if time.time() - os.path.getmtime(path) > CACHE_TTL:
+            return None
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def cache_set(url, data):
+    """Store fetched data for a LinkedIn URL (best effort)."""
+    tmp_path = None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write to a temp file first so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+        os.replace(tmp_path, _cache_path(url))
+    except (OSError, TypeError) as e:
+        log.warning("Could not cache %s: %s", url, e)
+        # Nothing else ever removes a stray temp file
+        if tmp_path:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+
+def new_download_path():
+    """
+    Create an empty temp file for an in-progress Apify download.
+
+    It lives in CACHE_DIR rather than the caller's output directory, which
+    the web app may clear while the actor is still running.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".download")
+    os.close(fd)
+    return path
+
+
+def validate_linkedin_profile_url(url):
+    """
+    Validate if the URL is a valid LinkedIn individual profile URL.
+
+    Args:
+        url: String URL to validate
+    
+    Returns:
+        Boolean indicating if URL is valid
+    """
+    return detect_url_type(url) == 'user'
+
+
+def validate_linkedin_company_url(url):
+    """
+    Validate if the URL is a valid LinkedIn company URL.
+
+    Args:
+        url: String URL to validate
+    
+    Returns:
+        Boolean indicating if URL is valid
+    """
+    return detect_url_type(url) == 'company'
+
+
+def count_populated_fields(data):
+    """
+    Count non-empty fields at the top level and inside `basic_info`.
+
+    A cheap completeness signal for scraped profiles: it looks at keys only
+    and never serializes the (possibly large) nested lists.
+    """
+    count = sum(1 for value in data.values() if value)
+    basic_info = data.get("basic_info")
+    if isinstance(basic_info, dict):
+        count += sum(1 for value in basic_info.values() if value)
+    return count